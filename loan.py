@@ -1,10 +1,35 @@
 
 import bisect
 import csv
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 from decimal import Decimal
 
+# Bump whenever the simulation logic changes so previously saved schedules are no longer matched
+SCHEDULE_VERSION = 1
+
+
+def portfolio_fingerprint(loans: list["Loan"], payment_bands: dict[int, Decimal]) -> str:
+    """
+    Return a hash identifying a set of loans and payment bands without simulating them
+    Values are normalized so that equal amounts written differently (1000 vs 1000.0) share a fingerprint
+    """
+    def canonical(value) -> str:
+        return str(Decimal(value).normalize())
+
+    portfolio = {"loans": [[loan.name, canonical(loan.principal), canonical(loan.rate), canonical(loan.min_pmt)]
+                           for loan in loans],
+                 "payment_bands": [[int(month), canonical(payment)] for month, payment in sorted(payment_bands.items())],
+                 "version": SCHEDULE_VERSION}
+    return hashlib.sha256(json.dumps(portfolio).encode()).hexdigest()[:16]
+
 
 class Loan:
     """
@@ -79,12 +104,20 @@ class LoanManager:
     def __init__(self, loans: list[Loan] = None, payment_bands: dict[int, Decimal] = None):
         self.loans = loans if loans is not None else []
         self.loan_df = pd.DataFrame()
+        self.fingerprint = None
         self.payment_bands = payment_bands if payment_bands is not None else {
             0: Decimal(1000)}
         self._refresh_loan_df()
 
     @staticmethod
     def read_from_file():
+        return LoanManager(*LoanManager.read_inputs_from_file())
+
+    @staticmethod
+    def read_inputs_from_file() -> tuple[list[Loan], dict[int, Decimal]]:
+        """
+        Read the loans and payment bands from loans.csv and payment_bands.csv without simulating them
+        """
         loans = []
         with open("loans.csv", 'r') as csvfile:
             reader = csv.DictReader(csvfile)
@@ -96,7 +129,7 @@ class LoanManager:
             reader = csv.DictReader(csvfile)
             payment_bands = {int(line["month"]): Decimal(
                 line["payment"]) for line in reader}
-        return LoanManager(loans, payment_bands)
+        return loans, payment_bands
 
     def save_to_file(self) -> None:
         """
@@ -192,6 +225,8 @@ class LoanManager:
             ongoing_loans = [loan for loan in ongoing_loans if not loan.done]
             month += 1
         self.loan_df = pd.concat(loan_data)
+        # Only record the fingerprint once loan_df matches it, a failed refresh keeps the old pair
+        self.fingerprint = portfolio_fingerprint(self.loans, self.payment_bands)
 
     def __str__(self) -> str:
         s = ""
@@ -200,6 +235,175 @@ class LoanManager:
         return s
 
 
+class ScheduleStore:
+    """
+    Save computed loan schedules to disk as one .npy file per column, keyed by portfolio fingerprint
+    Rows are stored in month order so a range of months is a contiguous slice of each memory-mapped column
+    A writer killed mid-save leaves a .tmp-* directory behind, these are removed by cleanup
+    """
+    # Version of the on-disk format, the simulation logic is versioned by SCHEDULE_VERSION
+    VERSION = 1
+    # Temporary directories older than this (in seconds) are assumed to belong to dead writers
+    STALE_TMP_AGE = 3600
+    COLUMNS = ("Loan", "Month", "Interest", "Payment", "Balance")
+
+    def __init__(self, root: str = "schedules"):
+        self.root = root
+
+    def contains(self, fingerprint: str) -> bool:
+        """Return whether there is a schedule with the given fingerprint in the current format"""
+        try:
+            self._read_schema(fingerprint)
+        except (KeyError, ValueError):
+            return False
+        return True
+
+    def cleanup(self, max_age: float = STALE_TMP_AGE) -> None:
+        """
+        Remove temporary directories left behind by writers that died mid-save
+        Only directories older than max_age seconds are removed so saves in progress are not disturbed
+        """
+        if not os.path.isdir(self.root):
+            return
+        now = time.time()
+        for entry in os.listdir(self.root):
+            if not entry.startswith(".tmp-"):
+                continue
+            path = os.path.join(self.root, entry)
+            # Another writer may remove the same directory first
+            try:
+                if now - os.path.getmtime(path) > max_age:
+                    shutil.rmtree(path)
+            except FileNotFoundError:
+                continue
+
+    def save(self, loan_manager: LoanManager) -> str:
+        """
+        Save the loan manager's schedule and return its fingerprint
+        Schedules are immutable once written, so an existing one is left untouched
+        unless it was written in an older format, in which case it is replaced
+        The fingerprint is the one recorded by the last successful refresh, so it always matches loan_df
+        Loans are identified by name in the saved schedule, so duplicate names are rejected
+        """
+        df = loan_manager.loan_df
+        if df.empty:
+            raise ValueError("There is no schedule to save")
+        # Every loan has exactly one Month 0 row, so fewer names than that means some are shared
+        names = sorted(df["Loan"].unique())
+        if len(names) != (df["Month"] == 0).sum():
+            raise ValueError("Cannot save a schedule with duplicate loan names")
+        fingerprint = loan_manager.fingerprint
+        if self.contains(fingerprint):
+            return fingerprint
+
+        df = df.sort_values(["Month", "Loan"], kind="stable")
+        # Keep pandas' own code type so load can wrap the memory-mapped codes without converting them
+        columns = {"Loan": pd.Categorical(df["Loan"], categories=names).codes,
+                   "Month": df["Month"].to_numpy(dtype=np.int64),
+                   "Interest": df["Interest"].to_numpy(dtype=np.float64),
+                   "Payment": df["Payment"].to_numpy(dtype=np.float64),
+                   "Balance": df["Balance"].to_numpy(dtype=np.float64)}
+        schema = {"version": self.VERSION, "rows": len(df), "loans": names}
+
+        # Write to a temporary directory first so readers never see a partial schedule
+        os.makedirs(self.root, exist_ok=True)
+        self.cleanup()
+        tmp_dir = self._make_tmp_dir()
+        path = os.path.join(self.root, fingerprint)
+        try:
+            for column, values in columns.items():
+                np.save(os.path.join(tmp_dir, f"{column}.npy"), values)
+            with open(os.path.join(tmp_dir, "schema.json"), 'w') as f:
+                json.dump(schema, f)
+            if os.path.exists(path):
+                # Another writer may have published the current format since the check above
+                if self.contains(fingerprint):
+                    return fingerprint
+                self._discard(path)
+            os.replace(tmp_dir, path)
+        except OSError:
+            # Another writer may have published the same schedule first
+            if self.contains(fingerprint):
+                return fingerprint
+            raise
+        finally:
+            if os.path.exists(tmp_dir):
+                shutil.rmtree(tmp_dir)
+        return fingerprint
+
+    def load_columns(self, fingerprint: str, columns: list[str] | str | None = None,
+                     start: int = None, stop: int = None) -> dict[str, np.ndarray]:
+        """
+        Return read-only memory-mapped views of the given columns for months in [start, stop)
+        Columns may be a list of names or a single name
+        Only the file headers and the Month column (to find the range) are read up front
+        The Loan column holds indices into the schema's list of loan names
+        Raises a KeyError if there is no schedule with the given fingerprint
+        """
+        return self._map_columns(fingerprint, self._read_schema(fingerprint), columns, start, stop)
+
+    def load(self, fingerprint: str, columns: list[str] | str | None = None,
+             start: int = None, stop: int = None) -> pd.DataFrame:
+        """
+        Return the saved schedule for months in [start, stop) as a dataframe backed by the memory-mapped columns
+        The Loan column is categorical, with the schema's loan names as categories
+        With all columns, the result can be passed straight to Plotter.refresh
+        Raises a KeyError if there is no schedule with the given fingerprint
+        """
+        schema = self._read_schema(fingerprint)
+        data = self._map_columns(fingerprint, schema, columns, start, stop)
+        if "Loan" in data:
+            data["Loan"] = pd.Categorical.from_codes(data["Loan"], schema["loans"])
+        return pd.DataFrame(data, copy=False)
+
+    def _map_columns(self, fingerprint: str, schema: dict, columns: list[str] | str | None,
+                     start: int, stop: int) -> dict[str, np.ndarray]:
+        if isinstance(columns, str):
+            columns = [columns]
+        columns = self.COLUMNS if columns is None else columns
+        for column in columns:
+            if column not in self.COLUMNS:
+                raise KeyError(f"Unknown schedule column {column}")
+
+        path = os.path.join(self.root, fingerprint)
+        months = np.load(os.path.join(path, "Month.npy"), mmap_mode='r')
+        lo = 0 if start is None else int(np.searchsorted(months, start, side="left"))
+        hi = schema["rows"] if stop is None else int(np.searchsorted(months, stop, side="left"))
+        return {column: np.load(os.path.join(path, f"{column}.npy"), mmap_mode='r')[lo:hi]
+                for column in columns}
+
+    def _read_schema(self, fingerprint: str) -> dict:
+        try:
+            with open(os.path.join(self.root, fingerprint, "schema.json"), 'r') as f:
+                schema = json.load(f)
+        except FileNotFoundError:
+            raise KeyError(f"No schedule {fingerprint}")
+        if schema["version"] != self.VERSION:
+            raise ValueError(
+                f"Schedule {fingerprint} has version {schema['version']}, expected {self.VERSION}")
+        return schema
+
+    def _discard(self, path: str) -> None:
+        """
+        Remove a schedule written in an older format
+        It is first moved aside so the new schedule can take its place even if the removal is interrupted
+        """
+        stale_dir = self._make_tmp_dir()
+        try:
+            # Move into the directory rather than onto it, replacing a directory only works on POSIX
+            os.replace(path, os.path.join(stale_dir, "old"))
+        except FileNotFoundError:
+            # Another writer already moved it
+            pass
+        shutil.rmtree(stale_dir, ignore_errors=True)
+
+    def _make_tmp_dir(self) -> str:
+        """Create a temporary directory in the store, with permissions from the process umask"""
+        path = os.path.join(self.root, f".tmp-{uuid.uuid4().hex}")
+        os.mkdir(path)
+        return path
+
+
 class Plotter:
     """
     Holds a figure containing the main loan plots
@@ -225,7 +429,7 @@ class Plotter:
         Plot a loan balances on stackplot
         """
         pivot_df = self.df.pivot_table(
-            index="Month", columns="Loan", values="Balance", fill_value=0)
+            index="Month", columns="Loan", values="Balance", fill_value=0, observed=True)
         self.order = sorted(
             pivot_df.columns, key=lambda x: pivot_df[x].iloc[0], reverse=True)
         pivot_df = pivot_df[self.order]
@@ -241,7 +445,7 @@ class Plotter:
         Plot payments by loan on a stacked bar chart
         """
         pivot_df = self.df.pivot_table(
-            index="Month", columns="Loan", values="Payment", fill_value=0)
+            index="Month", columns="Loan", values="Payment", fill_value=0, observed=True)
         pivot_df = pivot_df[self.order]
         months = pivot_df.index.values
         loan_balances = pivot_df.transpose().values
@@ -288,7 +492,7 @@ class Plotter:
         """
         Plot loan balances on a line chart
         """
-        grouped = self.df.groupby("Loan")
+        grouped = self.df.groupby("Loan", observed=True)
         plots = []
         for name, group in grouped:
             plots.append((name, group["Month"], group["Balance"]))
@@ -302,7 +506,7 @@ class Plotter:
         """
         Plot cumulative payments on a line chart
         """
-        grouped = self.df.groupby("Loan").sum()
+        grouped = self.df.groupby("Loan", observed=True).sum()
         grouped = grouped.loc[self.order]
         grouped["Principal"] = grouped["Payment"] - grouped["Interest"]
         grouped[["Principal", "Interest"]].astype(float).plot(
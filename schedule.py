@@ -0,0 +1,28 @@
+import time
+import matplotlib.pyplot as plt
+from loan import LoanManager, Plotter, ScheduleStore, portfolio_fingerprint
+
+
+def main():
+    """
+    Plot the schedule for loans.csv and payment_bands.csv from the schedule store
+    The loans are only simulated (and the schedule saved) if the store doesn't already have it
+    """
+    store = ScheduleStore()
+    loans, payment_bands = LoanManager.read_inputs_from_file()
+    fingerprint = portfolio_fingerprint(loans, payment_bands)
+    if not store.contains(fingerprint):
+        print(f"Simulating schedule {fingerprint}")
+        store.save(LoanManager(loans, payment_bands))
+
+    start = time.perf_counter()
+    df = store.load(fingerprint)
+    print(f"Loaded schedule {fingerprint} ({len(df)} rows) in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    plotter = Plotter()
+    plotter.refresh(df)
+    plt.show()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+import json
+import os
+import time
+from decimal import Decimal
+
+import matplotlib
+matplotlib.use("Agg")
+import numpy as np
+import pandas as pd
+import pytest
+
+import loan
+from loan import Loan, LoanManager, Plotter, ScheduleStore, portfolio_fingerprint
+
+
+@pytest.fixture
+def loan_manager():
+    loans = [Loan("a", Decimal(5000), Decimal("0.08"), Decimal(100)),
+             Loan("b", Decimal(3000), Decimal("0.05"), Decimal(50))]
+    return LoanManager(loans, {0: Decimal(400), 6: Decimal(600)})
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ScheduleStore(str(tmp_path))
+
+
+def test_round_trip(loan_manager, store):
+    fingerprint = store.save(loan_manager)
+    expected = loan_manager.loan_df.sort_values(
+        ["Month", "Loan"], kind="stable").reset_index(drop=True)
+    loaded = store.load(fingerprint)
+    assert isinstance(loaded["Loan"].dtype, pd.CategoricalDtype)
+    pd.testing.assert_frame_equal(loaded.astype({"Loan": str}).copy(), expected, check_dtype=False)
+
+
+def test_load_does_not_copy_columns(loan_manager, store):
+    fingerprint = store.save(loan_manager)
+    loaded = store.load(fingerprint)
+    for column in ("Loan", "Month", "Interest", "Payment", "Balance"):
+        values = loaded[column].array.codes if column == "Loan" else loaded[column].to_numpy()
+        while not isinstance(values, np.memmap):
+            assert values.base is not None, f"{column} was copied"
+            values = values.base
+
+
+def test_save_is_idempotent(loan_manager, store):
+    fingerprint = store.save(loan_manager)
+    assert store.save(loan_manager) == fingerprint
+    assert os.listdir(store.root) == [fingerprint]
+
+
+def test_month_range(loan_manager, store):
+    fingerprint = store.save(loan_manager)
+    df = loan_manager.loan_df
+    last = int(df["Month"].max())
+
+    sliced = store.load(fingerprint, start=3, stop=6)
+    assert sorted(sliced["Month"].unique()) == [3, 4, 5]
+    assert len(sliced) == len(df[(df["Month"] >= 3) & (df["Month"] < 6)])
+
+    assert len(store.load(fingerprint, start=0)) == len(df)
+    assert store.load(fingerprint, start=last)["Month"].tolist() == [last]
+    assert store.load(fingerprint, stop=0).empty
+    assert store.load(fingerprint, start=last + 1).empty
+
+
+def test_load_columns_are_read_only_memmaps(loan_manager, store):
+    fingerprint = store.save(loan_manager)
+    columns = store.load_columns(fingerprint, ["Balance", "Month"], start=2, stop=4)
+    assert list(columns) == ["Balance", "Month"]
+    for values in columns.values():
+        assert isinstance(values, np.memmap)
+        assert not values.flags.writeable
+    assert set(columns["Month"]) == {2, 3}
+
+
+def test_single_column_name(loan_manager, store):
+    fingerprint = store.save(loan_manager)
+    assert list(store.load(fingerprint, "Balance").columns) == ["Balance"]
+
+
+def test_unknown_column(loan_manager, store):
+    fingerprint = store.save(loan_manager)
+    with pytest.raises(KeyError):
+        store.load(fingerprint, ["Principal"])
+
+
+def test_version_mismatch(loan_manager, store):
+    fingerprint = store.save(loan_manager)
+    schema_path = os.path.join(store.root, fingerprint, "schema.json")
+    with open(schema_path, 'r') as f:
+        schema = json.load(f)
+    schema["version"] = ScheduleStore.VERSION + 1
+    with open(schema_path, 'w') as f:
+        json.dump(schema, f)
+    with pytest.raises(ValueError):
+        store.load(fingerprint)
+
+
+def test_version_bump_replaces_schedule(loan_manager, store, monkeypatch):
+    fingerprint = store.save(loan_manager)
+    monkeypatch.setattr(ScheduleStore, "VERSION", ScheduleStore.VERSION + 1)
+    assert not store.contains(fingerprint)
+    assert store.save(loan_manager) == fingerprint
+    assert store.contains(fingerprint)
+    assert len(store.load(fingerprint)) == len(loan_manager.loan_df)
+    assert os.listdir(store.root) == [fingerprint]
+
+
+def test_saved_schedule_is_readable_by_others(loan_manager, store):
+    umask = os.umask(0o022)
+    try:
+        fingerprint = store.save(loan_manager)
+    finally:
+        os.umask(umask)
+    assert os.stat(os.path.join(store.root, fingerprint)).st_mode & 0o777 == 0o755
+
+
+def test_failed_mutation_keeps_fingerprint(loan_manager, store):
+    fingerprint = loan_manager.fingerprint
+    with pytest.raises(ValueError):
+        loan_manager.add_loan("c", Decimal(1000), Decimal("0.1"), Decimal(1000))
+    # loan_df is stale, so the fingerprint must still describe the old portfolio
+    assert loan_manager.fingerprint == fingerprint
+    assert store.save(loan_manager) == fingerprint
+    assert set(store.load(fingerprint)["Loan"]) == {"a", "b"}
+
+
+def test_rejected_duplicate_loan_can_still_save(loan_manager, store):
+    fingerprint = loan_manager.fingerprint
+    with pytest.raises(ValueError):
+        loan_manager.add_loan("a", Decimal(1000), Decimal("0.1"), Decimal(1000))
+    assert store.save(loan_manager) == fingerprint
+
+
+def test_concurrent_writer_published_first(loan_manager, store, monkeypatch):
+    fingerprint = loan_manager.fingerprint
+    other = ScheduleStore(store.root)
+    real_replace = os.replace
+
+    def replace_after_other_writer(src, dst):
+        monkeypatch.setattr(os, "replace", real_replace)
+        other.save(loan_manager)
+        real_replace(src, dst)
+
+    monkeypatch.setattr(os, "replace", replace_after_other_writer)
+    assert store.save(loan_manager) == fingerprint
+    assert os.listdir(store.root) == [fingerprint]
+
+
+def test_concurrent_writer_published_after_check(loan_manager, store, monkeypatch):
+    fingerprint = store.save(loan_manager)
+    monkeypatch.setattr(ScheduleStore, "VERSION", ScheduleStore.VERSION + 1)
+    other = ScheduleStore(store.root)
+    path = os.path.join(store.root, fingerprint)
+    published = []
+    real_dump = json.dump
+
+    def dump_after_other_writer(obj, f):
+        monkeypatch.setattr(json, "dump", real_dump)
+        real_dump(obj, f)
+        other.save(loan_manager)
+        published.append(os.stat(path).st_ino)
+
+    monkeypatch.setattr(json, "dump", dump_after_other_writer)
+    assert store.save(loan_manager) == fingerprint
+    # The other writer's schedule is kept rather than discarded as an old format
+    assert os.stat(path).st_ino == published[0]
+    assert os.listdir(store.root) == [fingerprint]
+    assert store.contains(fingerprint)
+
+
+def test_failed_write_removes_tmp_dir(loan_manager, store, monkeypatch):
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(np, "save", fail)
+    with pytest.raises(OSError):
+        store.save(loan_manager)
+    assert os.listdir(store.root) == []
+
+
+def test_plot_loaded_schedule(loan_manager, store):
+    fingerprint = store.save(loan_manager)
+    plotter = Plotter()
+    plotter.refresh(store.load(fingerprint))
+    assert plotter.order == ["a", "b"]
+
+
+def test_plot_month_range_skips_paid_off_loans(loan_manager, store):
+    fingerprint = store.save(loan_manager)
+    df = loan_manager.loan_df
+    last = int(df["Month"].max())
+    remaining = list(df.loc[df["Month"] == last, "Loan"])
+    plotter = Plotter()
+    plotter.refresh(store.load(fingerprint, start=last))
+    assert list(plotter.order) == remaining
+
+
+def test_fingerprint_without_simulating(loan_manager):
+    assert portfolio_fingerprint(loan_manager.loans, loan_manager.payment_bands) == loan_manager.fingerprint
+
+
+def test_fingerprint_is_canonical():
+    loans = [Loan("a", Decimal("5000.0"), Decimal("0.050"), Decimal("100.00"))]
+    same_loans = [Loan("a", Decimal(5000), Decimal("0.05"), Decimal(100))]
+    assert (portfolio_fingerprint(loans, {0: Decimal("400.0")})
+            == portfolio_fingerprint(same_loans, {0: Decimal(400)}))
+    assert portfolio_fingerprint(loans, {0: Decimal(400)}) != portfolio_fingerprint(loans, {0: Decimal(401)})
+
+
+def test_fingerprint_tracks_schedule_version(loan_manager, monkeypatch):
+    monkeypatch.setattr(loan, "SCHEDULE_VERSION", loan.SCHEDULE_VERSION + 1)
+    assert portfolio_fingerprint(loan_manager.loans, loan_manager.payment_bands) != loan_manager.fingerprint
+
+
+def test_unknown_fingerprint(store):
+    with pytest.raises(KeyError):
+        store.load("0000000000000000")
+    with pytest.raises(KeyError):
+        store.load_columns("0000000000000000")
+
+
+def test_duplicate_loan_names(store):
+    loans = [Loan("a", Decimal(5000), Decimal("0.08"), Decimal(100)),
+             Loan("a", Decimal(3000), Decimal("0.05"), Decimal(50))]
+    with pytest.raises(ValueError):
+        store.save(LoanManager(loans, {0: Decimal(400)}))
+    assert not os.path.exists(store.root) or os.listdir(store.root) == []
+
+
+def test_cleanup_removes_stale_tmp_dirs(loan_manager, store):
+    stale = os.path.join(store.root, ".tmp-stale")
+    fresh = os.path.join(store.root, ".tmp-fresh")
+    os.makedirs(stale)
+    os.makedirs(fresh)
+    old = time.time() - 2 * ScheduleStore.STALE_TMP_AGE
+    os.utime(stale, (old, old))
+    fingerprint = store.save(loan_manager)
+    assert sorted(os.listdir(store.root)) == sorted([".tmp-fresh", fingerprint])
+
+
+def test_cleanup_tolerates_concurrent_removal(store, monkeypatch):
+    stale = os.path.join(store.root, ".tmp-stale")
+    os.makedirs(stale)
+    real_getmtime = os.path.getmtime
+
+    def removed_by_other_writer(path):
+        os.rmdir(path)
+        return real_getmtime(path)
+
+    monkeypatch.setattr(os.path, "getmtime", removed_by_other_writer)
+    store.cleanup()
+    assert os.listdir(store.root) == []